@@ -1,2 +1,4 @@
-from .minesweeper import GameConfig, GameStatus, GameResult, Square, MoveResult, Game, AI, RandomAI, run_games
+from .minesweeper import GameConfig, GameStatus, Action, GameResult, Square, MoveResult, Game, AI, RandomAI, run_games
+from .profiler import Profiler
+from .sparse import SparseGame
 from .visualize import GameVisualizer, PyGameVisualizer
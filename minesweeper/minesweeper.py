@@ -30,6 +30,14 @@ class GameStatus (enum.Enum):
     QUIT = 4
 
 
+class Action (enum.Enum):
+    """Player action enum"""
+    SELECT = 1
+    FLAG = 2
+    UNFLAG = 3
+    CHORD = 4
+
+
 class GameResult:
     """Result of a single minesweeper game
 
@@ -89,7 +97,9 @@ class Game:
         mines (list): 2d list of booleans indicating mine locations.
         exposed (list): 2d list of booleans indicating exposed squares.
         counts (list): 2d list of integer counts of neighboring mines.
+        flag_counts (list): 2d list of integer counts of neighboring flags.
     """
+    NEIGHBOR_OFFSETS = tuple((dx, dy) for dx, dy in itertools.product([-1, 0, 1], repeat=2) if dx or dy)
 
     def __init__(self, config, mines=None):
         """
@@ -105,17 +115,21 @@ class Game:
         self._explosion = False
         self._quit = False
         self._num_safe_squares = self.width * self.height - self.num_mines
+        self._flags = set()
+        self._init_board(mines)
+        logger.info("Game initialized")
+
+    def _init_board(self, mines):
+        """Allocates the board storage and places the mines"""
         self.exposed = [[False for y in range(self.height)] for x in range(self.width)]
         self.counts = [[0 for y in range(self.height)] for x in range(self.width)]
-        self._flags = {}
-
+        self.flag_counts = [[0 for y in range(self.height)] for x in range(self.width)]
         if mines:
             self.mines = copy.deepcopy(mines)
         else:
             self.mines = [[False for y in range(self.height)] for x in range(self.width)]
             self._place_mines()
         self._init_counts()
-        logger.info("Game initialized")
 
     @property
     def flags(self):
@@ -124,7 +138,14 @@ class Game:
 
     @flags.setter
     def flags(self, flags):
-        self._flags = set(flags)
+        flags = set(flags)
+        for x, y in self._flags - flags:
+            self._remove_flag(x, y)
+        for x, y in flags - self._flags:
+            if self._is_outside_board(x, y) or self.exposed[x][y]:
+                logger.debug("Ignoring flag at %d, %d as it is off the board or exposed", x, y)
+            else:
+                self._add_flag(x, y)
 
     @property
     def state(self):
@@ -191,7 +212,81 @@ class Game:
             raise ValueError('Position already exposed')
         self.num_moves += 1
         # must call update before accessing the status
-        squares = self._update(x, y)
+        squares = self._update([(x, y)])
+        logger.info("%d squares are revealed", len(squares))
+        return MoveResult(self.status, squares)
+
+    def flag(self, x, y):
+        """Flag a square as a mine.
+
+        Flagging does not count as a move.
+
+        Args:
+            x (int): Zero-based x position.
+            y (int): Zero-based y position.
+
+        Returns:
+            MoveResult: Game status with no exposed squares.
+
+        Raises:
+            ValueError: if game over, square exposed or already flagged, or position off the board
+        """
+        logger.info("Player has flagged %d, %d", x, y)
+        self._check_hidden(x, y)
+        if (x, y) in self._flags:
+            raise ValueError('Position already flagged')
+        self._add_flag(x, y)
+        return MoveResult(self.status)
+
+    def unflag(self, x, y):
+        """Remove a flag from a square.
+
+        Unflagging does not count as a move.
+
+        Args:
+            x (int): Zero-based x position.
+            y (int): Zero-based y position.
+
+        Returns:
+            MoveResult: Game status with no exposed squares.
+
+        Raises:
+            ValueError: if game over, square not flagged, or position off the board
+        """
+        logger.info("Player has unflagged %d, %d", x, y)
+        self._check_hidden(x, y)
+        if (x, y) not in self._flags:
+            raise ValueError('Position is not flagged')
+        self._remove_flag(x, y)
+        return MoveResult(self.status)
+
+    def chord(self, x, y):
+        """Expose all unflagged neighbors of an exposed square.
+
+        The number of flagged neighbors must match the count of the square.
+        If a flag is wrong, a mine is exposed and the game is lost.
+
+        Args:
+            x (int): Zero-based x position.
+            y (int): Zero-based y position.
+
+        Returns:
+            MoveResult: Did a mine explode and list of squares exposed.
+
+        Raises:
+            ValueError: if game over, square not exposed or count does not match flags, or position off the board
+        """
+        logger.info("Player has chorded %d, %d", x, y)
+        if self._is_outside_board(x, y):
+            raise ValueError('Position ({},{}) is outside the board'.format(x, y))
+        if self.game_over:
+            raise ValueError('Game is already over')
+        if not self.exposed[x][y]:
+            raise ValueError('Position is not exposed')
+        if self.flag_counts[x][y] != self.counts[x][y]:
+            raise ValueError('Number of flags does not match count')
+        self.num_moves += 1
+        squares = self._update(self._chord_positions(x, y))
         logger.info("%d squares are revealed", len(squares))
         return MoveResult(self.status, squares)
 
@@ -213,28 +308,31 @@ class Game:
                 if not self._is_outside_board(x + dx, y + dy):
                     self.counts[x][y] += self.mines[x + dx][y + dy]
 
-    def _update(self, x, y):
+    def _update(self, positions):
         """Update the state of the game
 
-        Finds all the squares to expose based on a selection.
+        Finds all the squares to expose based on a list of selected positions.
         This uses an 8 neighbor region growing algorithm to expand the board if
-        the chosen square is not a neighbor to a mine.
+        a chosen square is not a neighbor to a mine.
         Returns a list of squares that have been exposed.
         """
-        self._expose_square(x, y)
-        squares = [Square(x, y, self.counts[x][y])]
-        if self.mines[x][y]:
-            self._explosion = True
-            return squares
-        if self.counts[x][y] != 0:
+        squares = []
+        stack = []
+        for x, y in positions:
+            if self.exposed[x][y]:
+                continue
+            self._expose_square(x, y)
+            squares.append(Square(x, y, self.counts[x][y]))
+            if self.mines[x][y]:
+                self._explosion = True
+            elif self._test_if_count_0(x, y):
+                stack.append((x, y))
+        if self._explosion:
             return squares
 
-        stack = [(x, y)]
         while len(stack) > 0:
             (x, y) = stack.pop()
-            for dx, dy in itertools.product([-1, 0, 1], repeat=2):
-                if dx == 0 and dy == 0:
-                    continue
+            for dx, dy in self.NEIGHBOR_OFFSETS:
                 new_x, new_y = x + dx, y + dy
                 if not self._is_outside_board(new_x, new_y):
                     if not self.exposed[new_x][new_y]:
@@ -247,6 +345,38 @@ class Game:
     def _expose_square(self, x, y):
         self.exposed[x][y] = True
         self._num_exposed_squares += 1
+        if (x, y) in self._flags:
+            self._remove_flag(x, y)
+
+    def _chord_positions(self, x, y):
+        """Returns the hidden and unflagged neighbors of a square"""
+        return [(nx, ny) for nx, ny in self._neighbors(x, y)
+                if not self.exposed[nx][ny] and (nx, ny) not in self._flags]
+
+    def _add_flag(self, x, y):
+        self._flags.add((x, y))
+        for nx, ny in self._neighbors(x, y):
+            self.flag_counts[nx][ny] += 1
+
+    def _remove_flag(self, x, y):
+        self._flags.remove((x, y))
+        for nx, ny in self._neighbors(x, y):
+            self.flag_counts[nx][ny] -= 1
+
+    def _check_hidden(self, x, y):
+        """Validate that a position can be flagged or unflagged"""
+        if self._is_outside_board(x, y):
+            raise ValueError('Position ({},{}) is outside the board'.format(x, y))
+        if self.game_over:
+            raise ValueError('Game is already over')
+        if self.exposed[x][y]:
+            raise ValueError('Position already exposed')
+
+    def _neighbors(self, x, y):
+        """Generates the positions of the neighbors of a square on the board"""
+        for dx, dy in self.NEIGHBOR_OFFSETS:
+            if not self._is_outside_board(x + dx, y + dy):
+                yield x + dx, y + dy
 
     def _test_if_count_0(self, x, y):
         """Does this square have a count of zero?"""
@@ -277,7 +407,8 @@ class AI(abc.ABC):
         """Get the next move from the AI
 
         Returns:
-            tuple: x,y position with zero-based index
+            tuple: x,y position with zero-based index.
+                An optional third element selects the Action (default is SELECT).
         """
         pass
 
@@ -296,6 +427,8 @@ class AI(abc.ABC):
 
         The locations are x,y tuples.
         This is for display only. Override if desired.
+        AIs that flag through Action.FLAG do not need to override this.
+        It is ignored, and its flags cleared, once the AI has used Action.FLAG or Action.UNFLAG in a game.
         """
         return []
 
@@ -330,10 +463,21 @@ class Runner:
     Attributes:
         game (Game): Minesweeper game
         ai (AI): Minesweeper AI
+        profiler (Profiler): Optional profiler for timing each phase of a move
     """
-    def __init__(self, game, ai):
+    def __init__(self, game, ai, profiler=None):
         self.game = game
         self.ai = ai
+        self.profiler = profiler
+        # only copy display flags from AIs that override the default
+        # and stop once the AI places flags with actions
+        self._sync_flags = type(ai).flags is not AI.flags
+        self._actions = {
+            Action.SELECT: game.select,
+            Action.FLAG: game.flag,
+            Action.UNFLAG: game.unflag,
+            Action.CHORD: game.chord,
+        }
 
     def __iter__(self):
         """Returns an iterator"""
@@ -342,18 +486,29 @@ class Runner:
     def __next__(self):
         """Advances the game one move"""
         if not self.game.game_over:
-            coordinates = self.ai.next()
-            result = self.game.select(*coordinates)
-            self.ai.update(result)
+            move = self._call('next', self.ai.next)
+            action = move[2] if len(move) > 2 else Action.SELECT
+            if self._sync_flags and action in (Action.FLAG, Action.UNFLAG):
+                # drop the display flags so they do not mix with the AI's own flags
+                self._sync_flags = False
+                self.game.flags = ()
+            result = self._call('move', self._actions[action], move[0], move[1])
+            self._call('update', self.ai.update, result)
             if result.status == GameStatus.PLAYING:
-                self.game.flags = self.ai.flags
+                if self._sync_flags:
+                    self.game.flags = self.ai.flags
             else:
                 logger.info("Game is over")
         else:
             raise StopIteration()
 
+    def _call(self, phase, func, *args):
+        if self.profiler:
+            return self.profiler.call(phase, func, *args)
+        return func(*args)
 
-def run_games(config, num_games, ai, viz=None):
+
+def run_games(config, num_games, ai, viz=None, profiler=None, game_class=Game):
     """ Run a set of games to evaluate an AI
 
     Args:
@@ -361,6 +516,8 @@ def run_games(config, num_games, ai, viz=None):
         num_games (int): Number of games.
         ai (AI): The AI
         viz (GameVisualizer, optional): Visualizer
+        profiler (Profiler, optional): Profiler for timing the phases of each move
+        game_class (type, optional): Game engine class such as SparseGame for huge boards
 
     Returns:
         list: List of GameResult objects
@@ -368,13 +525,21 @@ def run_games(config, num_games, ai, viz=None):
     results = []
     for n in range(num_games):
         logger.info("Starting game %d", n + 1)
-        ai.reset(config)
-        game = Game(config)
-        runner = Runner(game, ai)
-        if viz:
-            viz.run(runner)
-        else:
-            for _ in runner:
-                pass
+        if profiler:
+            profiler.start_game()
+        try:
+            ai.reset(config)
+            game = game_class(config)
+            runner = Runner(game, ai, profiler)
+            if viz:
+                viz.run(runner)
+            else:
+                for _ in runner:
+                    pass
+        finally:
+            if profiler:
+                profiler.end_game()
         results.append(game.result)
+    if profiler:
+        profiler.finish()
     return results
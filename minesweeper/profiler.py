@@ -0,0 +1,148 @@
+import cProfile
+import collections
+import logging
+import os
+import pstats
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """Profiler for the phases of each move
+
+    Wall time is attributed to the AI choosing a move (next), the game engine
+    processing it (move) and the AI receiving the result (update).
+    Optionally, cProfile is run over a sampled subset of games, including game setup.
+    cProfile slows down the sampled games so the overhead scales with the sample rate.
+    The sampled games are left out of the phase times so they are not inflated by cProfile.
+
+    Attributes:
+        phases (dict): Total seconds spent in each phase of the games not sampled.
+        num_moves (int): Number of moves timed.
+        num_games (int): Number of games played.
+        sampled_games (list): Zero-based indexes of the games run under cProfile.
+        stats (pstats.Stats): Combined cProfile statistics or None if no games were sampled.
+    """
+    PHASES = ('next', 'move', 'update')
+    PSTATS_FILENAME = 'minesweeper.pstats'
+    COLLAPSED_FILENAME = 'minesweeper.collapsed'
+    # bounds on the stacks generated from the call graph
+    MAX_STACK_DEPTH = 100
+    MIN_STACK_FRACTION = 0.001
+
+    def __init__(self, sample_rate=0.0, output_dir=None):
+        """
+        Args:
+            sample_rate (float): Fraction of games to run under cProfile (0 to 1).
+            output_dir (str, optional): Directory for writing the .pstats and collapsed-stack files.
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError('Sample rate must be between 0 and 1')
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.phases = {phase: 0.0 for phase in self.PHASES}
+        self.num_moves = 0
+        self.num_games = 0
+        self.sampled_games = []
+        self.stats = None
+        self._profile = None
+
+    def call(self, phase, func, *args):
+        """Call a function and add its wall time to a phase"""
+        if self._profile:
+            return func(*args)
+        start = time.perf_counter()
+        value = func(*args)
+        self.phases[phase] += time.perf_counter() - start
+        if phase == 'move':
+            self.num_moves += 1
+        return value
+
+    def start_game(self):
+        """Called before a game is played"""
+        # games are sampled at evenly spaced intervals
+        n = self.num_games
+        if int((n + 1) * self.sample_rate) > int(n * self.sample_rate):
+            logger.info("Profiling game %d", n + 1)
+            self.sampled_games.append(n)
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def end_game(self):
+        """Called after a game is over"""
+        if self._profile:
+            self._profile.disable()
+            if self.stats is None:
+                self.stats = pstats.Stats(self._profile)
+            else:
+                self.stats.add(self._profile)
+            self._profile = None
+        self.num_games += 1
+
+    def finish(self):
+        """Write the profiler output if an output directory was given"""
+        if self.output_dir is None or self.stats is None:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.stats.dump_stats(os.path.join(self.output_dir, self.PSTATS_FILENAME))
+        with open(os.path.join(self.output_dir, self.COLLAPSED_FILENAME), 'w') as fp:
+            for stack, count in sorted(self.collapsed_stacks().items()):
+                fp.write('{} {}\n'.format(stack, count))
+        logger.info("Profile written to %s", self.output_dir)
+
+    def collapsed_stacks(self):
+        """Convert the cProfile statistics into collapsed stacks for flame graphs
+
+        cProfile only records caller/callee pairs so the time of a function is split
+        across its callers in proportion to the cumulative time of each call edge.
+        This is an approximation. To keep the number of stacks bounded when helpers are
+        called from many places, paths below MIN_STACK_FRACTION of the total time or
+        deeper than MAX_STACK_DEPTH are dropped.
+
+        Returns:
+            dict: Semicolon separated stacks mapped to microseconds of own time.
+        """
+        stacks = collections.Counter()
+        if self.stats is None:
+            return stacks
+        stats = self.stats.stats
+        callees = collections.defaultdict(dict)
+        for func, (_, _, _, _, callers) in stats.items():
+            for caller, edge in callers.items():
+                callees[caller][func] = edge[3]
+        roots = [func for func, value in stats.items() if not value[4]]
+        # time splits between callees so at most 1 / MIN_STACK_FRACTION paths survive per depth
+        min_seconds = max(sum(stats[root][3] for root in roots) * self.MIN_STACK_FRACTION, 1e-6)
+
+        def walk(func, stack, seen, seconds):
+            cumulative = stats[func][3]
+            if cumulative <= 0 or seconds < min_seconds or len(seen) > self.MAX_STACK_DEPTH:
+                return
+            scale = min(seconds / cumulative, 1.0)
+            stacks[stack] += int(stats[func][2] * scale * 1e6)
+            for callee, edge_seconds in callees[func].items():
+                if callee not in seen:
+                    walk(callee, stack + ';' + self._label(callee), seen | {callee}, edge_seconds * scale)
+
+        for root in roots:
+            walk(root, self._label(root), {root}, stats[root][3])
+        return collections.Counter({stack: count for stack, count in stacks.items() if count > 0})
+
+    def report(self):
+        """str: Table of time spent in each phase"""
+        total = sum(self.phases.values())
+        lines = ['{:<8}{:>12}{:>8}{:>14}'.format('phase', 'seconds', '%', 'us/move')]
+        for phase in self.PHASES:
+            seconds = self.phases[phase]
+            percent = 100 * seconds / total if total else 0.0
+            per_move = 1e6 * seconds / self.num_moves if self.num_moves else 0.0
+            lines.append('{:<8}{:>12.4f}{:>8.1f}{:>14.2f}'.format(phase, seconds, percent, per_move))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _label(func):
+        filename, line, name = func
+        if filename == '~':
+            return name
+        return '{}:{}:{}'.format(os.path.basename(filename), line, name)
@@ -0,0 +1,251 @@
+import collections
+import random
+
+from .minesweeper import Game, Square
+
+
+class Grid:
+    """Read/write view of board storage with [x][y] indexing
+
+    This lets the sparse storage be used the same way as the 2d lists of Game.
+    """
+    def __init__(self, width, getter, setter=None):
+        self._width = width
+        self._getter = getter
+        self._setter = setter
+
+    def __len__(self):
+        return self._width
+
+    def __getitem__(self, x):
+        return GridColumn(self, x)
+
+
+class GridColumn:
+    """Single column of a Grid"""
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._x = x
+
+    def __getitem__(self, y):
+        return self._grid._getter(self._x, y)
+
+    def __setitem__(self, y, value):
+        if self._grid._setter is None:
+            raise TypeError('Grid is read only')
+        self._grid._setter(self._x, y, value)
+
+
+class SparseGame(Game):
+    """Minesweeper game engine for huge boards
+
+    Memory scales with the number of mines and the part of the board that has been
+    revealed rather than with the size of the board.
+    Mines are stored as a set of indices. The board is divided into square chunks.
+    The neighboring mine counts of a chunk are computed when a square in it is first
+    accessed and exposed squares are tracked in bit-packed tiles per chunk.
+
+    The mines, exposed, counts and flag_counts attributes are Grid views that support
+    the same [x][y] indexing as Game for code outside the engine such as the visualizer.
+    Avoid the state property on huge boards as it builds the full 2d list.
+
+    Every square exposed by a move is returned in the MoveResult so time and memory
+    also scale with the size of the region a move opens. On boards with a low density
+    of mines (below about 15%), a square with a count of zero can open most of the board.
+    """
+    # must be a multiple of 8 for the bit-packed tiles
+    CHUNK_SIZE = 64
+
+    def __init__(self, config, mines=None, mine_positions=None):
+        """
+        Args:
+            config (GameConfig): Configuration for this game.
+            mines (list, optional): Optional 2d list of mine locations like Game.
+            mine_positions (iterable, optional): Optional mine positions as x,y tuples.
+                This avoids building the full board.
+        """
+        self._mine_positions = mine_positions
+        super().__init__(config, mines)
+
+    def _init_board(self, mines):
+        self._mine_indices = set()
+        self._count_tiles = {}
+        self._exposed_tiles = {}
+        self._flag_counts = collections.Counter()
+        self.mines = Grid(self.width, self._is_mine)
+        self.counts = Grid(self.width, self._get_count)
+        self.exposed = Grid(self.width, self._is_exposed, self._set_exposed)
+        self.flag_counts = Grid(self.width, self._get_flag_count, self._set_flag_count)
+        if mines:
+            if len(mines) != self.width or any(len(column) != self.height for column in mines):
+                raise ValueError('Mines must be a {}x{} 2d list'.format(self.width, self.height))
+            self._add_mines((x, y) for x, column in enumerate(mines) for y, mine in enumerate(column) if mine)
+        elif self._mine_positions is not None:
+            self._add_mines(self._mine_positions)
+        else:
+            self._place_mines()
+        self._mine_positions = None
+
+    def _add_mines(self, positions):
+        for x, y in positions:
+            if self._is_outside_board(x, y):
+                raise ValueError('Mine position ({},{}) is outside the board'.format(x, y))
+            self._mine_indices.add(x * self.height + y)
+        if len(self._mine_indices) != self.num_mines:
+            raise ValueError('Expected {} mines but got {}'.format(self.num_mines, len(self._mine_indices)))
+
+    def _place_mines(self):
+        # sampling a range does not materialize the board
+        self._mine_indices.update(random.sample(range(self.width * self.height), self.num_mines))
+
+    def _update(self, positions):
+        """Update the state of the game
+
+        Same region growing as Game but each square is checked and exposed with a
+        single call to the chunk storage rather than going through the Grid views.
+        """
+        squares = []
+        stack = []
+        for x, y in positions:
+            count = self._expose_if_hidden(x, y)
+            if count is None:
+                continue
+            squares.append(Square(x, y, count))
+            if self._is_mine(x, y):
+                self._explosion = True
+            elif count == 0:
+                stack.append((x, y))
+        if self._explosion:
+            return squares
+
+        # the flood works on flat indices and most neighbors are already exposed so
+        # they are checked inline, first against the squares exposed by this move
+        # and then against the chunk storage
+        expose_if_hidden = self._expose_if_hidden
+        exposed_tiles = self._exposed_tiles
+        width, height, size = self.width, self.height, self.CHUNK_SIZE
+        interior_deltas = tuple(dx * height + dy for dx, dy in self.NEIGHBOR_OFFSETS)
+        stack = [x * height + y for x, y in stack]
+        exposed_now = set(stack)
+        while len(stack) > 0:
+            index = stack.pop()
+            x, y = divmod(index, height)
+            if 0 < x < width - 1 and 0 < y < height - 1:
+                neighbors = [index + delta for delta in interior_deltas]
+            else:
+                neighbors = [nx * height + ny for nx, ny in self._neighbors(x, y)]
+            for new_index in neighbors:
+                if new_index in exposed_now:
+                    continue
+                new_x, new_y = divmod(new_index, height)
+                tile = exposed_tiles.get((new_x // size, new_y // size))
+                if tile is not None:
+                    offset = (new_x % size) * size + new_y % size
+                    if tile[offset >> 3] & (1 << (offset & 7)):
+                        continue
+                count = expose_if_hidden(new_x, new_y)
+                exposed_now.add(new_index)
+                squares.append(Square(new_x, new_y, count))
+                if count == 0:
+                    stack.append(new_index)
+        return squares
+
+    def _expose_if_hidden(self, x, y):
+        """Exposes a square and returns its count or None if it was already exposed"""
+        size = self.CHUNK_SIZE
+        key = (x // size, y // size)
+        offset = (x % size) * size + y % size
+        tile = self._exposed_tiles.get(key)
+        if tile is None:
+            tile = self._exposed_tiles[key] = bytearray(size * size // 8)
+        bit = 1 << (offset & 7)
+        if tile[offset >> 3] & bit:
+            return None
+        tile[offset >> 3] |= bit
+        self._num_exposed_squares += 1
+        if self._flags and (x, y) in self._flags:
+            self._remove_flag(x, y)
+        counts = self._count_tiles.get(key)
+        if counts is None:
+            counts = self._compute_counts(key)
+        return counts[offset]
+
+    def _expose_square(self, x, y):
+        self._expose_if_hidden(x, y)
+
+    def _test_if_count_0(self, x, y):
+        return self._get_count(x, y) == 0
+
+    def _chord_positions(self, x, y):
+        return [(nx, ny) for nx, ny in self._neighbors(x, y)
+                if not self._is_exposed(nx, ny) and (nx, ny) not in self._flags]
+
+    def _add_flag(self, x, y):
+        self._flags.add((x, y))
+        for nx, ny in self._neighbors(x, y):
+            self._flag_counts[(nx, ny)] += 1
+
+    def _remove_flag(self, x, y):
+        self._flags.remove((x, y))
+        for nx, ny in self._neighbors(x, y):
+            self._set_flag_count(nx, ny, self._flag_counts[(nx, ny)] - 1)
+
+    def _chunk(self, x, y):
+        """Returns the key of the chunk and the offset of the square in the chunk"""
+        size = self.CHUNK_SIZE
+        return (x // size, y // size), (x % size) * size + y % size
+
+    def _is_mine(self, x, y):
+        return x * self.height + y in self._mine_indices
+
+    def _get_count(self, x, y):
+        key, offset = self._chunk(x, y)
+        tile = self._count_tiles.get(key)
+        if tile is None:
+            tile = self._compute_counts(key)
+        return tile[offset]
+
+    def _compute_counts(self, key):
+        """Calculates the neighboring mine counts of every square in a chunk"""
+        size = self.CHUNK_SIZE
+        tile = bytearray(size * size)
+        x_start, y_start = key[0] * size, key[1] * size
+        x_end = min(x_start + size, self.width)
+        y_end = min(y_start + size, self.height)
+        # each mine in the chunk or its border increments its neighbors in the chunk
+        for mine_x in range(max(x_start - 1, 0), min(x_end + 1, self.width)):
+            for mine_y in range(max(y_start - 1, 0), min(y_end + 1, self.height)):
+                if mine_x * self.height + mine_y not in self._mine_indices:
+                    continue
+                for x in range(max(mine_x - 1, x_start), min(mine_x + 2, x_end)):
+                    for y in range(max(mine_y - 1, y_start), min(mine_y + 2, y_end)):
+                        if x != mine_x or y != mine_y:
+                            tile[(x - x_start) * size + y - y_start] += 1
+        self._count_tiles[key] = tile
+        return tile
+
+    def _is_exposed(self, x, y):
+        key, offset = self._chunk(x, y)
+        tile = self._exposed_tiles.get(key)
+        if tile is None:
+            return False
+        return bool(tile[offset >> 3] & (1 << (offset & 7)))
+
+    def _set_exposed(self, x, y, value):
+        key, offset = self._chunk(x, y)
+        tile = self._exposed_tiles.get(key)
+        if tile is None:
+            tile = self._exposed_tiles[key] = bytearray(self.CHUNK_SIZE * self.CHUNK_SIZE // 8)
+        if value:
+            tile[offset >> 3] |= 1 << (offset & 7)
+        else:
+            tile[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+
+    def _get_flag_count(self, x, y):
+        return self._flag_counts[(x, y)]
+
+    def _set_flag_count(self, x, y, value):
+        if value:
+            self._flag_counts[(x, y)] = value
+        else:
+            del self._flag_counts[(x, y)]
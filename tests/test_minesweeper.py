@@ -1,3 +1,6 @@
+import logging
+import sys
+
 import pytest
 
 import minesweeper as ms
@@ -186,6 +189,90 @@ def test_flags(game1):
     assert 1 == len(game1.flags)
 
 
+def test_flags_setter_updates_flag_counts(game1):
+    game1.flags = [(1, 0), (3, 1)]
+    assert 2 == game1.flag_counts[2][1]
+    game1.flags = [(3, 1)]
+    assert 1 == game1.flag_counts[2][1]
+    assert 0 == game1.flag_counts[1][1]
+
+
+def test_flag_updates_neighbor_counts(game2):
+    result = game2.flag(1, 0)
+    assert ms.GameStatus.PLAYING == result.status
+    assert 0 == len(result.new_squares)
+    assert {(1, 0)} == game2.flags
+    assert 1 == game2.flag_counts[0][0]
+    assert 1 == game2.flag_counts[1][1]
+    assert 0 == game2.flag_counts[1][0]
+    assert 0 == game2.flag_counts[0][2]
+    assert 0 == game2.num_moves
+
+
+def test_flag_with_already_flagged_square(game2):
+    game2.flag(1, 0)
+    with pytest.raises(ValueError):
+        game2.flag(1, 0)
+
+
+def test_flag_with_exposed_square(game2):
+    game2.select(1, 1)
+    with pytest.raises(ValueError):
+        game2.flag(1, 1)
+
+
+def test_unflag(game2):
+    game2.flag(1, 0)
+    game2.unflag(1, 0)
+    assert 0 == len(game2.flags)
+    assert 0 == game2.flag_counts[1][1]
+
+
+def test_unflag_with_square_not_flagged(game2):
+    with pytest.raises(ValueError):
+        game2.unflag(1, 0)
+
+
+def test_select_clears_flag(game2):
+    game2.flag(0, 2)
+    game2.select(0, 2)
+    assert 0 == len(game2.flags)
+    assert 0 == game2.flag_counts[1][1]
+
+
+def test_chord_exposes_unflagged_neighbors(game2):
+    game2.select(1, 1)
+    game2.flag(1, 0)
+    game2.flag(2, 2)
+    result = game2.chord(1, 1)
+    assert game2.game_over
+    assert ms.GameStatus.VICTORY == result.status
+    assert 6 == len(result.new_squares)
+    assert ms.Square(0, 2, 0) in result.new_squares
+    assert 2 == game2.num_moves
+
+
+def test_chord_with_wrong_flag(game2):
+    game2.select(1, 1)
+    game2.flag(0, 0)
+    game2.flag(2, 2)
+    result = game2.chord(1, 1)
+    assert ms.GameStatus.DEFEAT == result.status
+
+
+def test_chord_with_count_not_matching_flags(game2):
+    game2.select(1, 1)
+    game2.flag(1, 0)
+    with pytest.raises(ValueError):
+        game2.chord(1, 1)
+    assert 1 == game2.num_moves
+
+
+def test_chord_with_square_not_exposed(game2):
+    with pytest.raises(ValueError):
+        game2.chord(1, 1)
+
+
 def test_square_eq_with_match():
     assert ms.Square(0, 0, 0) == ms.Square(0, 0, 0)
     assert ms.Square(5, 7, 3) == ms.Square(5, 7, 3)
@@ -206,3 +293,225 @@ def test_run_games():
     ai = ms.RandomAI()
     results = ms.run_games(config, 2, ai)
     assert 2 == len(results)
+
+
+class ChordAI(ms.AI):
+    def __init__(self):
+        self.moves = []
+
+    def reset(self, config):
+        self.moves = [(1, 1), (1, 0, ms.Action.FLAG), (2, 2, ms.Action.FLAG), (1, 1, ms.Action.CHORD)]
+
+    def next(self):
+        return self.moves.pop(0)
+
+    def update(self, result):
+        pass
+
+
+class DisplayFlagChordAI(ChordAI):
+    @property
+    def flags(self):
+        return [(0, 0)]
+
+
+def test_runner_with_actions(game2):
+    ai = ChordAI()
+    ai.reset(ms.GameConfig(3, 3, 2))
+    for _ in ms.minesweeper.Runner(game2, ai):
+        pass
+    assert game2.result.victory
+    assert 2 == game2.result.num_moves
+
+
+def test_runner_stops_syncing_flags_after_flag_action(game2):
+    ai = DisplayFlagChordAI()
+    ai.reset(ms.GameConfig(3, 3, 2))
+    for _ in ms.minesweeper.Runner(game2, ai):
+        pass
+    assert game2.result.victory
+
+
+def test_flags_setter_ignores_exposed_squares(game2, caplog):
+    caplog.set_level(logging.DEBUG, logger='minesweeper.minesweeper')
+    game2.select(1, 1)
+    game2.flags = [(1, 1), (3, 3), (1, 0)]
+    assert {(1, 0)} == game2.flags
+    assert 2 == len([r for r in caplog.records if r.levelname == 'DEBUG'])
+
+
+def test_run_games_with_profiler():
+    profiler = ms.Profiler()
+    results = ms.run_games(ms.GameConfig(), 3, ms.RandomAI(), profiler=profiler)
+    assert 3 == profiler.num_games
+    assert sum(result.num_moves for result in results) == profiler.num_moves
+    assert all(profiler.phases[phase] > 0 for phase in ms.Profiler.PHASES)
+    assert [] == profiler.sampled_games
+    assert profiler.stats is None
+
+
+def test_profiler_sampling(tmpdir):
+    profiler = ms.Profiler(sample_rate=0.5, output_dir=str(tmpdir))
+    ms.run_games(ms.GameConfig(), 4, ms.RandomAI(), profiler=profiler)
+    assert [1, 3] == profiler.sampled_games
+    assert tmpdir.join(ms.Profiler.PSTATS_FILENAME).check()
+    collapsed = tmpdir.join(ms.Profiler.COLLAPSED_FILENAME).read()
+    assert 'select' in collapsed
+    assert '_init_board' in collapsed
+
+
+def test_profiler_phase_times_exclude_sampled_games():
+    profiler = ms.Profiler(sample_rate=0.5)
+    results = ms.run_games(ms.GameConfig(), 4, ms.RandomAI(), profiler=profiler)
+    assert [1, 3] == profiler.sampled_games
+    assert results[0].num_moves + results[2].num_moves == profiler.num_moves
+
+
+class FailingAI(ms.RandomAI):
+    def next(self):
+        raise RuntimeError('AI failed')
+
+
+def test_profiler_disabled_when_ai_raises():
+    profiler = ms.Profiler(sample_rate=1.0)
+    with pytest.raises(RuntimeError):
+        ms.run_games(ms.GameConfig(), 1, FailingAI(), profiler=profiler)
+    assert sys.getprofile() is None
+    assert 1 == profiler.num_games
+
+
+class FakeStats:
+    def __init__(self, stats):
+        self.stats = stats
+
+
+def test_profiler_collapsed_stacks_with_diamond_call_graph():
+    # each level calls two helpers that both call the next level
+    depth = 30
+    stats = {}
+    for level in range(depth):
+        node = ('f.py', level, 'level')
+        callers = {}
+        if level > 0:
+            for helper in 'ab':
+                callers[('f.py', level - 1, helper)] = (1, 1, 0.0, 0.5)
+        stats[node] = (1, 1, 1e-3 if level == depth - 1 else 0.0, 1.0, callers)
+        if level < depth - 1:
+            for helper in 'ab':
+                stats[('f.py', level, helper)] = (1, 1, 0.0, 0.5, {node: (1, 1, 0.0, 0.5)})
+    profiler = ms.Profiler()
+    profiler.stats = FakeStats(stats)
+    stacks = profiler.collapsed_stacks()
+    assert len(stacks) < 1000
+
+
+def test_profiler_with_invalid_sample_rate():
+    with pytest.raises(ValueError):
+        ms.Profiler(sample_rate=2)
+
+
+def positions(mines):
+    return [(x, y) for x, column in enumerate(mines) for y, mine in enumerate(column) if mine]
+
+
+@pytest.fixture
+def sparse_game1(game1):
+    return ms.SparseGame(ms.GameConfig(5, 4, 4), mine_positions=positions(game1.mines))
+
+
+def test_sparse_game_init_for_total_mine_count():
+    game = ms.SparseGame(ms.GameConfig(100, 100, 800))
+    assert 800 == sum(game.mines[x][y] for x in range(100) for y in range(100))
+
+
+def test_sparse_game_init_with_game_mines(game1):
+    game = ms.SparseGame(ms.GameConfig(5, 4, 4), game1.mines)
+    assert game1.mines == [list(game.mines[x][y] for y in range(4)) for x in range(5)]
+
+
+def test_sparse_game_init_with_game_int_mines():
+    mines = [[0, 1], [0, 0], [1, 0]]
+    game = ms.SparseGame(ms.GameConfig(3, 2, 2), mines)
+    assert game.mines[0][1]
+    assert game.mines[2][0]
+    assert not game.mines[1][0]
+
+
+def test_sparse_game_init_with_wrong_shape_of_mines():
+    with pytest.raises(ValueError):
+        ms.SparseGame(ms.GameConfig(3, 2, 1), [(0, 1)])
+
+
+def test_sparse_game_init_with_no_mine_positions():
+    game = ms.SparseGame(ms.GameConfig(3, 3, 0), mine_positions=[])
+    assert ms.GameStatus.VICTORY == game.select(0, 0).status
+
+
+def test_sparse_game_init_with_wrong_number_of_mines():
+    with pytest.raises(ValueError):
+        ms.SparseGame(ms.GameConfig(5, 4, 4), mine_positions=[(0, 0), (1, 1)])
+
+
+def test_sparse_game_init_with_mine_outside_board():
+    with pytest.raises(ValueError):
+        ms.SparseGame(ms.GameConfig(5, 4, 1), mine_positions=[(5, 0)])
+
+
+def test_sparse_game_counts_match_game(game1, sparse_game1):
+    assert game1.counts == [list(sparse_game1.counts[x][y] for y in range(4)) for x in range(5)]
+
+
+def test_sparse_game_counts_across_chunks(monkeypatch):
+    monkeypatch.setattr(ms.SparseGame, 'CHUNK_SIZE', 8)
+    game = ms.SparseGame(ms.GameConfig(20, 20, 2), mine_positions=[(7, 7), (8, 8)])
+    assert 2 == game.counts[7][8]
+    assert 2 == game.counts[8][7]
+    assert 1 == game.counts[9][9]
+    assert 1 == game.counts[6][6]
+    assert 0 == game.counts[10][10]
+
+
+def test_sparse_game_select_matches_game(game1, sparse_game1):
+    for x, y in [(0, 3), (4, 0)]:
+        expected = game1.select(x, y)
+        result = sparse_game1.select(x, y)
+        assert expected.status == result.status
+        assert expected.new_squares == result.new_squares
+    assert game1.state == sparse_game1.state
+
+
+def test_sparse_game_flag_and_chord(game2):
+    game = ms.SparseGame(ms.GameConfig(3, 3, 2), game2.mines)
+    game.select(1, 1)
+    game.flag(1, 0)
+    game.flag(2, 2)
+    assert 2 == game.flag_counts[1][1]
+    result = game.chord(1, 1)
+    assert ms.GameStatus.VICTORY == result.status
+
+
+def test_sparse_game_memory_scales_with_exposed_squares():
+    game = ms.SparseGame(ms.GameConfig(10000, 10000, 1), mine_positions=[(1, 1)])
+    result = game.select(0, 0)
+    assert 1 == len(result.new_squares)
+    assert 1 == len(game._exposed_tiles)
+    assert game.exposed[0][0]
+    assert not game.exposed[9999][9999]
+
+
+def test_run_games_with_sparse_game():
+    results = ms.run_games(ms.GameConfig(), 2, ms.RandomAI(), game_class=ms.SparseGame)
+    assert 2 == len(results)
+
+
+def test_sparse_game_stress():
+    # the size and density in the README
+    config = ms.GameConfig(2000, 2000, 800000)
+    game = ms.SparseGame(config)
+    ai = ms.RandomAI()
+    ai.reset(config)
+    for _ in ms.minesweeper.Runner(game, ai):
+        pass
+    assert game.game_over
+    # at this density a move only opens a small region of the board
+    assert game._num_exposed_squares < config.width * config.height // 100